@@ -1,15 +1,122 @@
 import os
+import sys
+import atexit
+import queue
+import hashlib
 import asyncio
 import httpx
 import logging
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+import numba
+import numpy as np
+import orjson
 from motor.motor_asyncio import AsyncIOMotorClient
 from pydantic import BaseModel, Field
 from beanie import init_beanie, Document, Indexed, PydanticObjectId, DecimalAnnotation
-from datetime import datetime
+from datetime import datetime, timezone
 from dotenv import load_dotenv
 
-# configure logging
-logging.basicConfig(level=logging.ERROR, format='%(asctime)s - %(levelname)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S', filename='data_collector.log')
+# configure logging through a queue so the event-loop thread never blocks on disk I/O
+_log_queue = queue.Queue(-1)
+_file_handler = RotatingFileHandler('data_collector.log', maxBytes=1_000_000, backupCount=3)
+_file_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S'))
+# the listener writes queued records to the log file on its own thread
+_log_listener = QueueListener(_log_queue, _file_handler)
+_log_listener.start()
+# attach the formatter-less QueueHandler directly so records reach the listener unformatted and are rendered once by the file handler
+_root_logger = logging.getLogger()
+_root_logger.setLevel(logging.ERROR)
+_root_logger.addHandler(QueueHandler(_log_queue))
+# flush any queued records when the interpreter exits
+atexit.register(_log_listener.stop)
+
+# load environment variables from the '.env' file once at import time
+load_dotenv()
+# get the value of the 'MONGO' environment variable and save it in the 'MONGO' variable, which is our database connection string
+MONGO = os.getenv('MONGO')
+# fail fast if the connection string is missing instead of rediscovering it every cycle
+if not MONGO:
+    logging.critical('Environment variable Error: the MONGO variable is not set')
+    sys.exit(1)
+
+# Coinbase API URL for Ethiopian Birr (ETB) exchange rates, parsed once so httpx skips its URL parser on every request
+_URL = httpx.URL('https://api.coinbase.com/v2/exchange-rates?currency=ETB')
+
+# the fiat and cryptocurrency keys tracked by the collector
+FIAT_KEYS: tuple[str, ...] = ('AED', 'EUR', 'USD')
+CRYPTO_KEYS: tuple[str, ...] = ('BTC', 'ETH', 'SOL')
+KEYS: tuple[str, ...] = FIAT_KEYS + CRYPTO_KEYS
+
+@numba.njit('float64[:](float64[:])', cache=True, fastmath=True)
+def _invert_floats(arr):
+    '''
+    computes the reciprocal of each element in a float64 array
+
+    Parameters:
+        arr: float64[:] - array of exchange rates
+
+    Returns:
+        float64[:] - array of inverted exchange rates
+    '''
+    # allocate the output array once and fill it in a loop that LLVM vectorizes
+    out = np.empty_like(arr)
+    for i in range(arr.shape[0]):
+        out[i] = 1.0 / arr[i]
+    return out
+
+# pre-warm the JIT-compiled helper on import so the compilation cost is not paid on the first fetch
+_invert_floats(np.ones(len(KEYS), dtype=np.float64))
+
+# file persisting the hash of the last stored rates across runs
+_HASH_FILE = 'data_collector.hash'
+
+# hash of the last stored rates, used to skip storing unchanged payloads
+_last_hash: bytes | None = None
+
+# shared AsyncClient instance, created lazily and reused across all fetches
+_client: httpx.AsyncClient | None = None
+
+# shared AsyncIOMotorClient instance, created once by _ensure_db and reused across all stores
+_mongo_client: AsyncIOMotorClient | None = None
+# tracks whether Beanie has been initialized so the document models are only registered once
+_beanie_ready = False
+
+def get_client() -> httpx.AsyncClient:
+    '''
+    returns the shared httpx AsyncClient, creating it on first use
+
+    Parameters:
+        None
+
+    Returns:
+        httpx.AsyncClient: the shared client with HTTP/2 and keep-alive pooling
+    '''
+    global _client
+    # create the client once so repeated fetches reuse pooled connections instead of paying a new TCP + TLS handshake
+    if _client is None:
+        _client = httpx.AsyncClient(
+            http2=True,
+            timeout=httpx.Timeout(10.0),
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=300),
+            headers={'accept-encoding': 'gzip, br', 'user-agent': 'birrexchange/1.0'}
+        )
+    return _client
+
+async def close_http_client() -> None:
+    '''
+    closes the shared httpx AsyncClient if it was created
+
+    Parameters:
+        None
+
+    Returns:
+        None
+    '''
+    global _client
+    # close the client to release the pooled connections
+    if _client is not None:
+        await _client.aclose()
+        _client = None
 
 async def fetch_exchange_rate() -> dict:
     '''
@@ -21,27 +128,29 @@ async def fetch_exchange_rate() -> dict:
     Returns:
         dict: includes exchange rates for fiat and cryptocurrencies
     '''
-    # define Coinbase API URI
-    base_url = 'https://api.coinbase.com/'
-    endpoint = 'v2/exchange-rates?currency=ETB'
-    # create an instance of the AsyncClient class from the httpx library
-    async with httpx.AsyncClient() as client:
+    # retry transient failures with exponential backoff so one stalled request does not lose the cycle
+    for attempt in range(3):
         try:
-            # send a GET request to the Coinbase API
-            response = await client.get(base_url + endpoint)
+            # send a GET request to the Coinbase API using the shared client, bounded by a hard timeout
+            response = await asyncio.wait_for(get_client().get(_URL), timeout=5.0)
             # raise an exception for 4xx or 5xx status codes
             response.raise_for_status()
-            # return the most recent exchange rates for Ethiopian Birr (ETB) in both fiat and cryptocurrencies
-            return response.json()['data']['rates']
+            # parse the response body with orjson and return the most recent exchange rates for Ethiopian Birr (ETB) in both fiat and cryptocurrencies
+            return orjson.loads(response.content)['data']['rates']
+        # handle transient errors (e.g. connection refused, timeout) by backing off 100ms, 400ms, 1600ms
+        except (httpx.TransportError, asyncio.TimeoutError) as e:
+            if attempt < 2:
+                await asyncio.sleep(0.1 * (4 ** attempt))
+            else:
+                logging.error('Request Error: %s', e)
         # handle HTTP status errors (e.g. 404, 500)
         except httpx.HTTPStatusError as e:
-            logging.error(f'Status Error: {e.response.status_code} - {e.response.reason_phrase}')
-        # handle HTTP errors (e.g. connection refused)
+            logging.error('Status Error: %s - %s', e.response.status_code, e.response.reason_phrase)
+            return
+        # handle HTTP errors (e.g. invalid URL)
         except httpx.HTTPError as e:
-            logging.error(f'HTTP Exception: {e.request.url} - {e}')
-        # handle request errors (e.g. DNS resolution failed)
-        except httpx.RequestError as e:
-            logging.error(f'Request Error: {e}')
+            logging.error('HTTP Exception: %s - %s', e.request.url, e)
+            return
 
 # define a Pydantic model for fiat currency rates
 class FiatRate(BaseModel):
@@ -55,55 +164,106 @@ class CryptoRate(BaseModel):
     ETH: DecimalAnnotation  # Ethereum
     SOL: DecimalAnnotation  # Solana
 
-# define a MongoDB document for fiat currency
-class Fiat(Document):
-    date: Indexed(datetime) = Field(default_factory=datetime.now) # the date retrieved, defaulting to the current date and time
-    rates: FiatRate # rates for different fiat currencies
+# define a MongoDB document holding both fiat and cryptocurrency rates for one collection cycle
+class Rates(Document):
+    date: Indexed(datetime) = Field(default_factory=lambda: datetime.now(timezone.utc)) # the date retrieved, defaulting to the current date and time in UTC
+    fiat: FiatRate # rates for different fiat currencies
+    crypto: CryptoRate # rates for different cryptocurrencies
 
     class Settings:
         # collection name in MongoDB
-        name = 'fiat'
+        name = 'rates'
 
-# define a MongoDB document for cryptocurrency
-class Crypto(Document):
-    date: Indexed(datetime) = Field(default_factory=datetime.now) # the date retrieved, defaulting to the current date and time
-    rates: CryptoRate # rates for different cryptocurrencies
+async def _ensure_db() -> None:
+    '''
+    initializes the shared MongoDB client and Beanie exactly once
 
-    class Settings:
-        # collection name in MongoDB
-        name = 'crypto'
+    Parameters:
+        None
+
+    Returns:
+        None
+    '''
+    global _mongo_client, _beanie_ready
+    # skip the setup entirely if a previous call already completed it
+    if _beanie_ready:
+        return
+    try:
+        # create an AsyncIOMotorClient instance with the MongoDB connection string
+        _mongo_client = AsyncIOMotorClient(MONGO, maxPoolSize=50)
+        # initialize Beanie with the database and document models
+        await init_beanie(database=_mongo_client.birr, document_models=[Rates])
+        # mark the database as ready so subsequent calls return immediately
+        _beanie_ready = True
+    except Exception as e:
+        # handle any exceptions associated with the database connection
+        logging.critical('Database connection Error: %s', e)
 
-async def clean_exchange_rate(rate: dict) -> dict:
+def _rate_hash(rate: dict) -> bytes:
     '''
-    cleans the exchange rates by utilizing the Pydantic models
+    hashes the tracked subset of an exchange rate payload
 
     Parameters:
-        rate: dict - previous exchange rate dictionary
+        rate: dict - raw exchange rate dictionary from the Coinbase API
 
     Returns:
-        dict: cleaned exchange rates
+        bytes: BLAKE2b digest of the tracked rates
     '''
-    # filter the fiat currency using the FiatRate Pydantic model
-    fiat = dict(FiatRate(**rate))
-    # filter the crypto currency using the CryptoRate Pydantic model
-    crypto = dict(CryptoRate(**rate))
-    # merge the two dictionaries into one
-    return {**fiat, **crypto}
+    # hash only the tracked subset so unrelated currencies cannot force a write
+    return hashlib.blake2b(orjson.dumps({key: rate[key] for key in KEYS}), digest_size=16).digest()
 
-async def invert_exchange_rate(filtered_rate: dict) -> dict:
+def rate_changed(rate: dict) -> bool:
     '''
-    convert the cleaned exchange rate to Ethiopian Birr (ETB)
+    checks whether the tracked rates differ from the last stored payload
 
     Parameters:
-        filtered_rate: dict - cleaned exchange rate dictionary
+        rate: dict - raw exchange rate dictionary from the Coinbase API
+
+    Returns:
+        bool: True if the rates changed and should be stored
+    '''
+    global _last_hash
+    # on a fresh start, recover the previous run's hash from disk
+    if _last_hash is None and os.path.isfile(_HASH_FILE):
+        with open(_HASH_FILE, 'rb') as file:
+            _last_hash = file.read()
+    # an identical payload carries no new information, so skip the store
+    return _rate_hash(rate) != _last_hash
+
+def save_rate_hash(rate: dict) -> None:
+    '''
+    records the hash of a successfully stored payload
+
+    Parameters:
+        rate: dict - raw exchange rate dictionary from the Coinbase API
+
+    Returns:
+        None
+    '''
+    global _last_hash
+    # remember the stored payload's hash in memory and on disk for the next run
+    _last_hash = _rate_hash(rate)
+    with open(_HASH_FILE, 'wb') as file:
+        file.write(_last_hash)
+
+def invert_exchange_rate(rate: dict) -> dict:
+    '''
+    convert the exchange rates for the tracked currencies to Ethiopian Birr (ETB)
+
+    Parameters:
+        rate: dict - raw exchange rate dictionary from the Coinbase API
 
     Returns:
         dict: inverted exchange rate
     '''
-    # invert the exchange rates by dividing 1 by each rate
-    return {key: str(1/DecimalAnnotation(value)) for key, value in filtered_rate.items()}
+    # pick the six tracked keys straight out of the raw response and build a float64 array in one pass
+    arr = np.fromiter((rate[key] for key in KEYS), dtype=np.float64, count=len(KEYS))
+    # invert the exchange rates with the JIT-compiled reciprocal helper
+    inverted = _invert_floats(arr)
+    # map the inverted rates back to their currency keys as strings
+    return dict(zip(KEYS, inverted.astype(str)))
 
-async def store_exchange_rate(inverted_rate: dict) -> None:
+async def store_exchange_rate(inverted_rate: dict) -> bool:
     '''
     store the inverted exchange rates in MongoDB
 
@@ -111,36 +271,24 @@ async def store_exchange_rate(inverted_rate: dict) -> None:
         inverted_rate: dict - inverted exchange rate dictionary
 
     Returns:
-        None
+        bool: True if the document was inserted successfully
     '''
+    # skip the store if the database setup did not complete
+    if not _beanie_ready:
+        return False
     try:
-        # check if the .env file exists before loading environment variables
-        if not os.path.isfile('.env'):
-            logging.critical('File Error: the .env file is missing')
-            return
-        # load environment variables from the '.env' file
-        load_dotenv()
-        # get the value of the 'MONGO' environment variable and save it in the 'MONGO' variable, which is our database connection string
-        MONGO = os.getenv('MONGO')
-        # verify if the MONGO variable is not empty
-        if not MONGO:
-            logging.critical('Environment variable Error: the MONGO variable is not set')
-            return
-        # create an AsyncIOMotorClient instance with the MongoDB connection string
-        client = AsyncIOMotorClient(MONGO)
-        # initialize Beanie with the database and document models
-        await init_beanie(database=client.birr, document_models=[Fiat, Crypto])
-        # create a fiat document instance with the inverted exchange rate
-        fiat = Fiat(rates=FiatRate(**inverted_rate))
-        # insert the fiat document into the database
-        await fiat.insert()
-        # create a crypto document instance with the inverted exchange rate
-        crypto = Crypto(rates=CryptoRate(**inverted_rate))
-        # insert the crypto document into the database
-        await crypto.insert()
+        # split the inverted rates into their fiat and crypto halves once, validating each model a single time
+        fiat_rates = {key: inverted_rate[key] for key in FIAT_KEYS}
+        crypto_rates = {key: inverted_rate[key] for key in CRYPTO_KEYS}
+        # create a single rates document embedding both halves
+        rates = Rates(fiat=FiatRate(**fiat_rates), crypto=CryptoRate(**crypto_rates))
+        # insert the rates document into the database in one round trip
+        await rates.insert()
+        return True
     except Exception as e:
         # handle any exceptions associated with the database connection
-        logging.critical(f'Database connection Error: {e}')
+        logging.critical('Database connection Error: %s', e)
+        return False
 
 async def main() -> None:
     '''
@@ -152,15 +300,32 @@ async def main() -> None:
     Returns:
         None
     '''
-    # call the fetch_exchange_rate function and await its result
-    rate = await fetch_exchange_rate()
-    # call the clean_exchange_rate function and await its result
-    filtered_rate = await clean_exchange_rate(rate)
-    # call the invert_exchange_rate function and await its result
-    inverted_rate = await invert_exchange_rate(filtered_rate)
-    # call the store_exchange_rate function and await its result
-    await store_exchange_rate(inverted_rate)
+    try:
+        # kick off the MongoDB client and Beanie setup in the background so it overlaps with the fetch
+        db_task = asyncio.create_task(_ensure_db())
+        # call the fetch_exchange_rate function and await its result
+        rate = await fetch_exchange_rate()
+        # wait for the database setup to finish before storing
+        await db_task
+        # stop here if the fetch failed after exhausting its retries; the error is already logged
+        if rate is None:
+            return
+        # skip the rest of the pipeline when the rates have not changed since the last store
+        if not rate_changed(rate):
+            return
+        # call the invert_exchange_rate function, a plain function since it performs no I/O
+        inverted_rate = invert_exchange_rate(rate)
+        # call the store_exchange_rate function, recording the payload's hash only after a confirmed insert
+        if await store_exchange_rate(inverted_rate):
+            save_rate_hash(rate)
+    finally:
+        # close the shared httpx client before the event loop shuts down
+        await close_http_client()
 
 if __name__ == '__main__':
+    # install the libuv-backed uvloop event loop on supported platforms for lower per-operation overhead
+    if sys.platform != 'win32':
+        import uvloop
+        uvloop.install()
     # run the main function using the asyncio event loop
     asyncio.run(main())